@@ -0,0 +1,53 @@
+"""Shared helpers for the MCP proxy test suite.
+
+ica_mcp_core lives in the split skills checkout, not in this repo; resolve
+and import it once per process instead of re-probing the filesystem and
+re-inserting sys.path entries in every test.
+"""
+
+import functools
+import os
+import sys
+import unittest
+from pathlib import Path
+
+_REPO = Path(__file__).resolve().parents[2]
+
+_VERSION_BYTES = b"test"
+
+
+def make_layout(td, version_src=None):
+    """Create the standard project/ica-home pair under *td*.
+
+    The VERSION marker that makes ica-home look installed is written fresh,
+    or hardlinked from *version_src* when a class-level copy already exists.
+    """
+    project = td / "project"
+    project.mkdir(parents=True)
+    ica_home = td / "ica-home"
+    ica_home.mkdir()
+    if version_src is None:
+        (ica_home / "VERSION").write_bytes(_VERSION_BYTES)
+    else:
+        os.link(version_src, ica_home / "VERSION")
+    return project, ica_home
+
+
+@functools.lru_cache(maxsize=1)
+def load_core():
+    candidates = [
+        _REPO / "src" / "skills" / "mcp-common" / "scripts",
+        _REPO.parent / "skills" / "skills" / "mcp-common" / "scripts",
+    ]
+    split_repo_env = os.environ.get("ICA_SKILLS_REPO")
+    if split_repo_env:
+        candidates.append(Path(split_repo_env) / "skills" / "mcp-common" / "scripts")
+    core_dir = next((candidate for candidate in candidates if candidate.exists()), None)
+    if core_dir is None:
+        raise unittest.SkipTest("Skipping MCP tests: ica_mcp_core.py not available in this checkout.")
+    core_path = str(core_dir)
+    if core_path not in sys.path:
+        sys.path.insert(0, core_path)
+    import ica_mcp_core  # type: ignore
+
+    return ica_mcp_core
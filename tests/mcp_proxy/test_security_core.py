@@ -1,29 +1,17 @@
 import asyncio
-import os
-import sys
 import unittest
-from pathlib import Path
 
-
-def _load_core():
-    repo = Path(__file__).resolve().parents[2]
-    split_repo_env = os.environ.get("ICA_SKILLS_REPO")
-    candidates = [
-        repo / "src" / "skills" / "mcp-common" / "scripts",
-        repo.parent / "skills" / "skills" / "mcp-common" / "scripts",
-    ]
-    if split_repo_env:
-        candidates.append(Path(split_repo_env) / "skills" / "mcp-common" / "scripts")
-    core_dir = next((candidate for candidate in candidates if candidate.exists()), None)
-    if core_dir is None:
-        raise unittest.SkipTest("Skipping MCP core security tests: ica_mcp_core.py not available in this checkout.")
-    sys.path.insert(0, str(core_dir))
-    import ica_mcp_core  # type: ignore
-
-    return ica_mcp_core
+from _support import load_core as _load_core
 
 
 class TestMcpCoreSecurity(unittest.TestCase):
+    # One event loop for the whole class; asyncio.run would build and tear
+    # down a fresh loop for every coroutine under test.
+    @classmethod
+    def setUpClass(cls):
+        cls._loop = asyncio.new_event_loop()
+        cls.addClassCleanup(cls._loop.close)
+
     def test_validate_secure_url_blocks_plain_http_non_loopback(self):
         core = _load_core()
         with self.assertRaises(ValueError):
@@ -46,7 +34,7 @@ class TestMcpCoreSecurity(unittest.TestCase):
             }
         }
         with self.assertRaises(ValueError):
-            asyncio.run(core.oauth_auth_pkce("test-server", cfg, script_file=None))
+            self._loop.run_until_complete(core.oauth_auth_pkce("test-server", cfg, script_file=None))
 
     def test_client_credentials_rejects_http_token_endpoint(self):
         core = _load_core()
@@ -59,7 +47,7 @@ class TestMcpCoreSecurity(unittest.TestCase):
             }
         }
         with self.assertRaises(ValueError):
-            asyncio.run(core.oauth_auth_client_credentials("test-server", cfg, script_file=None))
+            self._loop.run_until_complete(core.oauth_auth_client_credentials("test-server", cfg, script_file=None))
 
 
 if __name__ == "__main__":
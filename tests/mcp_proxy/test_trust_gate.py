@@ -1,27 +1,37 @@
-import json
 import os
 import sys
 import tempfile
 import unittest
 from pathlib import Path
 
-
-def _load_core():
-    repo = Path(__file__).resolve().parents[2]
-    split_repo_env = os.environ.get("ICA_SKILLS_REPO")
-    candidates = [
-        repo / "src" / "skills" / "mcp-common" / "scripts",
-        repo.parent / "skills" / "skills" / "mcp-common" / "scripts",
-    ]
-    if split_repo_env:
-        candidates.append(Path(split_repo_env) / "skills" / "mcp-common" / "scripts")
-    core_dir = next((candidate for candidate in candidates if candidate.exists()), None)
-    if core_dir is None:
-        raise unittest.SkipTest("Skipping MCP trust-gate tests: ica_mcp_core.py not available in this checkout.")
-    sys.path.insert(0, str(core_dir))
-    import ica_mcp_core  # type: ignore
-
-    return ica_mcp_core
+from _support import load_core as _load_core
+from _support import make_layout
+
+# Fixed fixture configs, pre-baked to bytes so tests write them without a
+# json.dumps round-trip.
+_CONFIG_PROJECT_STDIO = (
+    b'{"mcpServers": {"project-stdio": {"command": "python3", "args": ["-c", "print(\'ok\')"]}}}'
+)
+_CONFIG_PROJECT_STDIO_CHANGED = (
+    b'{"mcpServers": {"project-stdio": {"command": "python3", "args": ["-c", "print(\'changed\')"]}}}'
+)
+_CONFIG_PROJECT_MIXED = (
+    b'{"mcpServers": {'
+    b'"project-stdio": {"command": "python3", "args": ["-c", "print(\'ok\')"]}, '
+    b'"project-http": {"url": "https://example.com/mcp"}}}'
+)
+_CONFIG_HOME_STDIO = (
+    b'{"mcpServers": {"home-stdio": {"command": "python3", "args": ["-c", "print(\'ok\')"]}}}'
+)
+
+
+def _clear_core_env_cache():
+    # Newer ica_mcp_core builds snapshot env reads into a module-level cache;
+    # drop it around env mutations so cached values never mask our overrides.
+    core = sys.modules.get("ica_mcp_core")
+    clear = getattr(core, "_env_cache_clear", None)
+    if clear is not None:
+        clear()
 
 
 class _EnvGuard:
@@ -36,6 +46,7 @@ class _EnvGuard:
                 os.environ.pop(k, None)
             else:
                 os.environ[k] = v
+        _clear_core_env_cache()
 
     def __exit__(self, exc_type, exc, tb):
         for k, old in self._old.items():
@@ -43,128 +54,97 @@ class _EnvGuard:
                 os.environ.pop(k, None)
             else:
                 os.environ[k] = old
+        _clear_core_env_cache()
 
 
 class TestTrustGate(unittest.TestCase):
+    # One class-level tmpdir with a single VERSION blob; each test gets its
+    # own project/ica-home pair (trust state is per ica-home) but hardlinks
+    # the read-only VERSION file instead of rewriting it.
+    @classmethod
+    def setUpClass(cls):
+        cls._td = tempfile.TemporaryDirectory()
+        cls.addClassCleanup(cls._td.cleanup)
+        cls._base = Path(cls._td.name)
+        cls._version = cls._base / "VERSION"
+        cls._version.write_text("test", encoding="utf-8")
+
+    def _fresh_layout(self):
+        return make_layout(self._base / self._testMethodName, version_src=self._version)
+
     def test_strict_blocks_project_stdio_until_trusted(self):
         core = _load_core()
-        with tempfile.TemporaryDirectory() as td:
-            td = Path(td)
-            project = td / "project"
-            project.mkdir()
-            ica_home = td / "ica-home"
-            ica_home.mkdir()
-            (ica_home / "VERSION").write_text("test", encoding="utf-8")
-
-            (project / ".mcp.json").write_text(
-                json.dumps(
-                    {
-                        "mcpServers": {
-                            "project-stdio": {"command": "python3", "args": ["-c", "print('ok')"]},
-                            "project-http": {"url": "https://example.com/mcp"},
-                        }
-                    }
-                ),
-                encoding="utf-8",
-            )
-            (ica_home / "mcp-servers.json").write_text(
-                json.dumps({"mcpServers": {"home-stdio": {"command": "python3", "args": ["-c", "print('ok')"]}}}),
-                encoding="utf-8",
-            )
-
-            with _EnvGuard(
-                {
-                    "ICA_HOME": str(ica_home),
-                    "ICA_MCP_STRICT_TRUST": "1",
-                    "ICA_MCP_ALLOW_PROJECT_STDIO": None,
-                    "MCP_CONFIG": None,
-                    "MCP_CONFIG_PATH": None,
-                }
-            ):
-                loaded = core.load_servers_merged(script_file=None, cwd=project)
-                self.assertNotIn("project-stdio", loaded.servers)
-                self.assertIn("project-http", loaded.servers)
-                self.assertIn("home-stdio", loaded.servers)
-                self.assertIn("project-stdio", loaded.blocked_servers)
-
-                trust = core.trust_project(project, script_file=None)
-                self.assertTrue(trust["trusted"])
-
-                loaded2 = core.load_servers_merged(script_file=None, cwd=project)
-                self.assertIn("project-stdio", loaded2.servers)
-                self.assertEqual(loaded2.blocked_servers, {})
+        project, ica_home = self._fresh_layout()
+
+        (project / ".mcp.json").write_bytes(_CONFIG_PROJECT_MIXED)
+        (ica_home / "mcp-servers.json").write_bytes(_CONFIG_HOME_STDIO)
+
+        with _EnvGuard(
+            {
+                "ICA_HOME": str(ica_home),
+                "ICA_MCP_STRICT_TRUST": "1",
+                "ICA_MCP_ALLOW_PROJECT_STDIO": None,
+                "MCP_CONFIG": None,
+                "MCP_CONFIG_PATH": None,
+            }
+        ):
+            loaded = core.load_servers_merged(script_file=None, cwd=project)
+            self.assertNotIn("project-stdio", loaded.servers)
+            self.assertIn("project-http", loaded.servers)
+            self.assertIn("home-stdio", loaded.servers)
+            self.assertIn("project-stdio", loaded.blocked_servers)
+
+            trust = core.trust_project(project, script_file=None)
+            self.assertTrue(trust["trusted"])
+
+            loaded2 = core.load_servers_merged(script_file=None, cwd=project)
+            self.assertIn("project-stdio", loaded2.servers)
+            self.assertEqual(loaded2.blocked_servers, {})
 
     def test_strict_allows_temporary_env_override(self):
         core = _load_core()
-        with tempfile.TemporaryDirectory() as td:
-            td = Path(td)
-            project = td / "project"
-            project.mkdir()
-            ica_home = td / "ica-home"
-            ica_home.mkdir()
-            (ica_home / "VERSION").write_text("test", encoding="utf-8")
-
-            (project / ".mcp.json").write_text(
-                json.dumps({"mcpServers": {"project-stdio": {"command": "python3", "args": ["-c", "print('ok')"]}}}),
-                encoding="utf-8",
-            )
-
-            with _EnvGuard(
-                {
-                    "ICA_HOME": str(ica_home),
-                    "ICA_MCP_STRICT_TRUST": "1",
-                    "ICA_MCP_ALLOW_PROJECT_STDIO": "1",
-                    "MCP_CONFIG": None,
-                    "MCP_CONFIG_PATH": None,
-                }
-            ):
-                loaded = core.load_servers_merged(script_file=None, cwd=project)
-                self.assertIn("project-stdio", loaded.servers)
-                self.assertEqual(loaded.blocked_servers, {})
+        project, ica_home = self._fresh_layout()
+
+        (project / ".mcp.json").write_bytes(_CONFIG_PROJECT_STDIO)
+
+        with _EnvGuard(
+            {
+                "ICA_HOME": str(ica_home),
+                "ICA_MCP_STRICT_TRUST": "1",
+                "ICA_MCP_ALLOW_PROJECT_STDIO": "1",
+                "MCP_CONFIG": None,
+                "MCP_CONFIG_PATH": None,
+            }
+        ):
+            loaded = core.load_servers_merged(script_file=None, cwd=project)
+            self.assertIn("project-stdio", loaded.servers)
+            self.assertEqual(loaded.blocked_servers, {})
 
     def test_strict_requires_retrust_after_project_config_change(self):
         core = _load_core()
-        with tempfile.TemporaryDirectory() as td:
-            td = Path(td)
-            project = td / "project"
-            project.mkdir()
-            ica_home = td / "ica-home"
-            ica_home.mkdir()
-            (ica_home / "VERSION").write_text("test", encoding="utf-8")
-
-            mcp_path = project / ".mcp.json"
-            mcp_path.write_text(
-                json.dumps({"mcpServers": {"project-stdio": {"command": "python3", "args": ["-c", "print('ok')"]}}}),
-                encoding="utf-8",
-            )
-
-            with _EnvGuard(
-                {
-                    "ICA_HOME": str(ica_home),
-                    "ICA_MCP_STRICT_TRUST": "1",
-                    "ICA_MCP_ALLOW_PROJECT_STDIO": None,
-                    "MCP_CONFIG": None,
-                    "MCP_CONFIG_PATH": None,
-                }
-            ):
-                core.trust_project(project, script_file=None)
-                loaded = core.load_servers_merged(script_file=None, cwd=project)
-                self.assertIn("project-stdio", loaded.servers)
-
-                # Modify config; trust hash should invalidate.
-                mcp_path.write_text(
-                    json.dumps(
-                        {
-                            "mcpServers": {
-                                "project-stdio": {"command": "python3", "args": ["-c", "print('changed')"]}
-                            }
-                        }
-                    ),
-                    encoding="utf-8",
-                )
-                loaded2 = core.load_servers_merged(script_file=None, cwd=project)
-                self.assertNotIn("project-stdio", loaded2.servers)
-                self.assertIn("project-stdio", loaded2.blocked_servers)
+        project, ica_home = self._fresh_layout()
+
+        mcp_path = project / ".mcp.json"
+        mcp_path.write_bytes(_CONFIG_PROJECT_STDIO)
+
+        with _EnvGuard(
+            {
+                "ICA_HOME": str(ica_home),
+                "ICA_MCP_STRICT_TRUST": "1",
+                "ICA_MCP_ALLOW_PROJECT_STDIO": None,
+                "MCP_CONFIG": None,
+                "MCP_CONFIG_PATH": None,
+            }
+        ):
+            core.trust_project(project, script_file=None)
+            loaded = core.load_servers_merged(script_file=None, cwd=project)
+            self.assertIn("project-stdio", loaded.servers)
+
+            # Modify config; trust hash should invalidate.
+            mcp_path.write_bytes(_CONFIG_PROJECT_STDIO_CHANGED)
+            loaded2 = core.load_servers_merged(script_file=None, cwd=project)
+            self.assertNotIn("project-stdio", loaded2.servers)
+            self.assertIn("project-stdio", loaded2.blocked_servers)
 
 
 if __name__ == "__main__":